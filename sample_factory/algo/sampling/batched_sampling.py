@@ -9,7 +9,11 @@ import numpy as np
 import torch
 from torch import Tensor
 
-from sample_factory.algo.sampling.sampling_utils import VectorEnvRunner, record_episode_statistics_wrapper_stats
+from sample_factory.algo.sampling.sampling_utils import (
+    PolicyRequest,
+    VectorEnvRunner,
+    record_episode_statistics_wrapper_stats,
+)
 from sample_factory.algo.utils.env_info import EnvInfo, check_env_info
 from sample_factory.algo.utils.make_env import BatchedVecEnv, SequentialVectorizeWrapper, make_env_func_batched
 from sample_factory.algo.utils.misc import EPISODIC, POLICY_ID_KEY
@@ -74,6 +78,12 @@ def process_action_space(actions: torch.Tensor, gpu_actions: bool, is_discrete:
     return actions
 
 
+@torch.jit.script
+def scale_and_clip_rewards(rewards: Tensor, scale: float, clip: float) -> Tensor:
+    # scripted so that the elementwise ops can be fused into a single kernel for GPU envs
+    return (rewards * scale).clamp(-clip, clip)
+
+
 class BatchedVectorEnvRunner(VectorEnvRunner):
     # TODO: comment
     """
@@ -130,10 +140,22 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
         self.last_obs = None
         self.last_rnn_state = None
         self.policy_id_buffer = None
+        self.not_done_buffer = None
+        self.host_actions_buffer: Optional[Tensor] = None
+        self.host_actions_pinned = False
 
         self.curr_traj: Optional[TensorDict] = None
         self.curr_step: Optional[TensorDict] = None
         self.curr_traj_slice: Optional[slice] = None
+        self.policy_requests: List[PolicyRequest] = []
+
+        # individual tensors of the current trajectory buffer, env outputs are written into these directly
+        self._traj_obs: Optional[TensorDict] = None
+        self._traj_rnn_states: Optional[Tensor] = None
+        self._traj_rewards: Optional[Tensor] = None
+        self._traj_dones: Optional[Tensor] = None
+        self._traj_time_outs: Optional[Tensor] = None
+        self._traj_policy_id: Optional[Tensor] = None
 
         self.curr_episode_reward = self.curr_episode_len = None
 
@@ -188,40 +210,75 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
         self.policy_id_buffer = torch.empty_like(self.traj_tensors["policy_id"][0 : self.vec_env.num_agents, 0])
         self.policy_id_buffer[:] = self.policy_id
 
+        self.not_done_buffer = torch.empty_like(self.traj_tensors["dones"][0 : self.vec_env.num_agents, 0])
+
+        if not self.env_info.gpu_actions:
+            discrete_actions = self.env_info.all_discrete or isinstance(self.env_info.action_space, gym.spaces.Discrete)
+            on_gpu = self.device.type == "cuda"
+            if on_gpu or discrete_actions:
+                # Policy outputs are float32 tensors, possibly on GPU, but the env expects actions on CPU. We copy
+                # actions to a preallocated host buffer on every step. For discrete actions the buffer is int32, so
+                # this single copy also does the cast and we don't need to allocate an intermediate int32 tensor.
+                # On GPU the buffer is pinned to avoid transfers through pageable host memory.
+                actions = self.policy_output_tensors["actions"]
+                actions_dtype = torch.int32 if discrete_actions else actions.dtype
+                self.host_actions_buffer = torch.empty(actions.shape, dtype=actions_dtype, pin_memory=on_gpu)
+                self.host_actions_pinned = on_gpu
+
         assert self.rollout_step == 0
 
-        self.curr_episode_reward = torch.zeros(self.vec_env.num_agents)
-        self.curr_episode_len = torch.zeros(self.vec_env.num_agents, dtype=torch.int32)
+        # for fully GPU-accelerated envs (i.e. IsaacGym) we keep episode statistics on the env device so that we
+        # don't have to copy rewards and dones to CPU on every step, we transfer them only when episodes finish
+        stats_device = self.device if self.env_info.gpu_actions else torch.device("cpu")
+        self.curr_episode_reward = torch.zeros(self.vec_env.num_agents, device=stats_device)
+        self.curr_episode_len = torch.zeros(self.vec_env.num_agents, dtype=torch.int32, device=stats_device)
         self.min_raw_rewards = torch.empty_like(self.curr_episode_reward).fill_(np.inf)
         self.max_raw_rewards = torch.empty_like(self.curr_episode_reward).fill_(-np.inf)
 
         self.env_step_ready = True
 
-    def _process_rewards(self, rewards_orig: Tensor, rewards_orig_cpu: Tensor) -> Tensor:
-        rewards = rewards_orig * self.cfg.reward_scale
-        rewards.clamp_(-self.cfg.reward_clip, self.cfg.reward_clip)
-        self.min_raw_rewards = torch.min(self.min_raw_rewards, rewards_orig_cpu)
-        self.max_raw_rewards = torch.max(self.max_raw_rewards, rewards_orig_cpu)
+    def _process_rewards(self, rewards_orig: Tensor, rewards_orig_stats: Tensor) -> Tensor:
+        if rewards_orig.is_cuda:
+            rewards = scale_and_clip_rewards(rewards_orig, float(self.cfg.reward_scale), float(self.cfg.reward_clip))
+        else:
+            # TorchScript does not fuse CPU kernels by default, two eager ops are cheaper than a scripted call here
+            rewards = rewards_orig * self.cfg.reward_scale
+            rewards.clamp_(-self.cfg.reward_clip, self.cfg.reward_clip)
+        self.min_raw_rewards = torch.min(self.min_raw_rewards, rewards_orig_stats)
+        self.max_raw_rewards = torch.max(self.max_raw_rewards, rewards_orig_stats)
         return rewards
 
     def _process_env_step(self, rewards: Tensor, dones_orig: Tensor, infos):
-        dones = dones_orig.cpu()
-        num_dones = dones.sum().item()
+        dones = dones_orig.to(self.curr_episode_reward.device)
 
         self.curr_episode_reward += rewards
         self.curr_episode_len += self.env_info.frameskip if self.cfg.summaries_use_frameskip else 1
 
         reports = []
-        if num_dones <= 0:
-            return reports
 
+        # indices of all agents that finished the episode on this step, we gather all episode stats with these
+        # indices at once instead of querying every finished agent individually
         finished = dones.nonzero(as_tuple=True)[0]
+        if finished.numel() == 0:
+            return reports
+
+        episode_stats = [
+            self.curr_episode_reward[finished],
+            self.curr_episode_len[finished],
+            self.min_raw_rewards[finished],
+            self.max_raw_rewards[finished],
+        ]
+        if finished.is_cuda:
+            # harvest all episode stats with a single device-to-host transfer
+            episode_stats[1] = episode_stats[1].float()
+            episode_stats = list(torch.stack(episode_stats).cpu())
+            episode_stats[1] = episode_stats[1].int()
 
         stats = dict(
-            reward=self.curr_episode_reward[finished],
-            len=self.curr_episode_len[finished],
-            min_raw_reward=self.min_raw_rewards[finished],
-            max_raw_reward=self.max_raw_rewards[finished],
+            reward=episode_stats[0],
+            len=episode_stats[1],
+            min_raw_reward=episode_stats[2],
+            max_raw_reward=episode_stats[3],
         )
 
         if isinstance(infos, dict):
@@ -236,7 +293,7 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
                         stats[key_str] = value.item()
                     elif len(value.shape) >= 1 and len(value) == self.vec_env.num_agents:
                         # saving value for all agents who finished the episode
-                        stats[key_str] = value[finished]
+                        stats[key_str] = value[finished.to(value.device)]
                     else:
                         log.warning(f"Infos tensor with unexpected shape {value.shape}")
                 elif isinstance(value, numbers.Number):
@@ -271,10 +328,10 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
 
         reports.append({EPISODIC: stats, POLICY_ID_KEY: self.policy_id})
 
-        self.curr_episode_reward[finished] = 0
-        self.curr_episode_len[finished] = 0
-        self.min_raw_rewards[finished] = np.inf
-        self.max_raw_rewards[finished] = -np.inf
+        self.curr_episode_reward.index_fill_(0, finished, 0)
+        self.curr_episode_len.index_fill_(0, finished, 0)
+        self.min_raw_rewards.index_fill_(0, finished, np.inf)
+        self.max_raw_rewards.index_fill_(0, finished, -np.inf)
 
         return reports
 
@@ -300,7 +357,17 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
         with timing.add_time("process_policy_outputs"):
             # save actions/logits/values etc. for the current rollout step
             self.curr_step[:] = self.policy_output_tensors
-            actions = preprocess_actions(self.env_info, self.policy_output_tensors["actions"])
+
+            actions = self.policy_output_tensors["actions"]
+            if self.host_actions_buffer is not None:
+                if self.host_actions_pinned:
+                    # the env needs the actions right away, so we wait for the copy to finish before stepping
+                    self.host_actions_buffer.copy_(actions, non_blocking=True)
+                    torch.cuda.current_stream(self.device).synchronize()
+                else:
+                    self.host_actions_buffer.copy_(actions)
+                actions = self.host_actions_buffer
+            actions = preprocess_actions(self.env_info, actions)
 
         complete_rollouts, episodic_stats = [], []
 
@@ -312,22 +379,27 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
             self.policy_id_buffer[:] = self.policy_id
 
             # record the results from the env step
-            rewards_cpu = rewards.cpu()
-            processed_rewards = self._process_rewards(rewards, rewards_cpu)
-            self.curr_step[:] = dict(
-                rewards=processed_rewards,
-                dones=dones,
-                time_outs=truncated,  # true only when done is also true, used for value bootstrapping
-                policy_id=self.policy_id_buffer,
-            )
+            # no-op for GPU envs, otherwise bring rewards to CPU where we keep the episode statistics
+            rewards_stats = rewards.to(self.curr_episode_reward.device)
+            processed_rewards = self._process_rewards(rewards, rewards_stats)
+            self._traj_rewards[:, self.rollout_step].copy_(processed_rewards)
+            self._traj_dones[:, self.rollout_step].copy_(dones)
+            # true only when done is also true, used for value bootstrapping
+            self._traj_time_outs[:, self.rollout_step].copy_(truncated)
+            self._traj_policy_id[:, self.rollout_step].copy_(self.policy_id_buffer)
 
             # reset next-step hidden states to zero if we encountered an episode boundary
             # not sure if this is the best practice, but this is what everybody seems to be doing
-            not_done = (1.0 - self.curr_step["dones"].float()).unsqueeze(-1)
-            self.last_rnn_state = self.policy_output_tensors["new_rnn_states"] * not_done
+            # multiplying by a bool mask treats it as {0, 1}, so we don't need a float conversion here
+            torch.logical_not(self._traj_dones[:, self.rollout_step], out=self.not_done_buffer)
+            torch.mul(
+                self.policy_output_tensors["new_rnn_states"],
+                self.not_done_buffer.unsqueeze(-1),
+                out=self.last_rnn_state,
+            )
 
             with timing.add_time("process_env_step"):
-                stats = self._process_env_step(rewards_cpu, dones, infos)
+                stats = self._process_env_step(rewards_stats, dones, infos)
             episodic_stats.extend(stats)
 
         self.rollout_step += 1
@@ -361,9 +433,22 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
 
             self.curr_traj_slice = buffers
             self.curr_traj = self.traj_tensors[self.curr_traj_slice]
+
+            self._traj_obs = self.curr_traj["obs"]
+            self._traj_rnn_states = self.curr_traj["rnn_states"]
+            self._traj_rewards = self.curr_traj["rewards"]
+            self._traj_dones = self.curr_traj["dones"]
+            self._traj_time_outs = self.curr_traj["time_outs"]
+            self._traj_policy_id = self.curr_traj["policy_id"]
+
+            # Policy requests for every step of the rollout, built once per trajectory buffer.
+            # Requests are pickled on every env step, so we send trajectory slice bounds as plain ints
+            # (serializing a slice object is several times slower). Inference worker reconstructs the slice.
+            start, stop = self.curr_traj_slice.start, self.curr_traj_slice.stop
+            self.policy_requests = [PolicyRequest(self.policy_id, (start, stop, t)) for t in range(self.cfg.rollout)]
             return True
 
-    def generate_policy_request(self) -> Optional[Dict]:
+    def generate_policy_request(self) -> Optional[PolicyRequest]:
         if not self.env_step_ready:
             # we haven't actually simulated the environment yet
             return None
@@ -374,8 +459,9 @@ class BatchedVectorEnvRunner(VectorEnvRunner):
 
         self.curr_step = self.curr_traj[:, self.rollout_step]
         # save observations and RNN states in a trajectory
-        self.curr_step[:] = dict(obs=self.last_obs, rnn_states=self.last_rnn_state)
-        policy_request = {self.policy_id: (self.curr_traj_slice, self.rollout_step)}
+        self._traj_obs[:, self.rollout_step] = self.last_obs
+        self._traj_rnn_states[:, self.rollout_step].copy_(self.last_rnn_state)
+        policy_request = self.policy_requests[self.rollout_step]
         self.env_step_ready = False
         return policy_request
 
@@ -186,7 +186,8 @@ class InferenceWorker(HeartbeatStoppableEventLoopObject, Configurable):
         with timing.add_time("deserialize"):
             obs = dict()
             rnn_states = []
-            for actor_idx, split_idx, traj_idx, device in self.requests:
+            for actor_idx, split_idx, (traj_start, traj_stop, rollout_step), device in self.requests:
+                traj_idx = (slice(traj_start, traj_stop), rollout_step)
                 # TODO: what should we do with data sampled on different devices
                 traj_tensors = self.traj_tensors[device]
                 dict_of_lists_append_idx(obs, traj_tensors["obs"], traj_idx)
@@ -10,7 +10,7 @@ from signal_slot.signal_slot import signal
 
 from sample_factory.algo.sampling.batched_sampling import BatchedVectorEnvRunner
 from sample_factory.algo.sampling.non_batched_sampling import NonBatchedVectorEnvRunner
-from sample_factory.algo.sampling.sampling_utils import VectorEnvRunner, rollout_worker_device
+from sample_factory.algo.sampling.sampling_utils import PolicyRequest, VectorEnvRunner, rollout_worker_device
 from sample_factory.algo.utils.context import SampleFactoryContext, set_global_context
 from sample_factory.algo.utils.env_info import EnvInfo
 from sample_factory.algo.utils.heartbeat import HeartbeatStoppableEventLoopObject
@@ -100,6 +100,9 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
 
         self.env_runners: List[VectorEnvRunner] = []
 
+        # policy requests generated while handling a single event, sent with one put_many() call per policy
+        self.pending_policy_requests: Dict[PolicyID, List] = dict()
+
         # training status updated by the runner
         self.training_info: List[Optional[Dict[str, Any]]] = [None for _ in range(self.cfg.num_policies)]
 
@@ -160,6 +163,7 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
             # taken by other workers). In that case, we will just enter an event loop and be woken up when
             # a buffer is freed (see on_trajectory_buffers_available()).
             self._maybe_send_policy_request(r)
+        self._flush_policy_requests()
 
         self.is_initialized = True
 
@@ -192,16 +196,29 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
             # make sure all writes to shared device buffers are completed
             runner.synchronize_devices()
 
-        with self.timing.add_time("enqueue_policy_requests"):
-            if policy_request is not None:
-                self._enqueue_policy_request(runner.split_idx, policy_request)
+        if policy_request is not None:
+            self._enqueue_policy_request(runner.split_idx, policy_request)
 
-    def _enqueue_policy_request(self, split_idx, policy_inputs):
-        """Distribute action requests to their corresponding queues."""
+    def _add_pending_policy_request(self, policy_id: PolicyID, split_idx: int, requests) -> None:
+        policy_request = (self.worker_idx, split_idx, requests, self.sampling_device)
+        if policy_id in self.pending_policy_requests:
+            self.pending_policy_requests[policy_id].append(policy_request)
+        else:
+            self.pending_policy_requests[policy_id] = [policy_request]
+
+    def _enqueue_policy_request(self, split_idx, policy_inputs: Dict | PolicyRequest):
+        """
+        Distribute action requests to their corresponding policies.
+        Requests are accumulated and actually sent to the queues in _flush_policy_requests().
+        """
+
+        if isinstance(policy_inputs, PolicyRequest):
+            # single-policy runner, no dict to iterate over
+            self._add_pending_policy_request(policy_inputs.policy_id, split_idx, policy_inputs.request)
+            return
 
         for policy_id, requests in policy_inputs.items():
-            policy_request = (self.worker_idx, split_idx, requests, self.sampling_device)
-            self.inference_queues[policy_id].put(policy_request)
+            self._add_pending_policy_request(policy_id, split_idx, requests)
 
         if not policy_inputs:
             # This can happen if all agents on this worker were deactivated (is_active=False)
@@ -215,8 +232,28 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
             # stopping signal
             self.emit(advance_rollouts_signal(self.worker_idx), split_idx, fake_policy_id)
 
+    def _flush_policy_requests(self):
+        """
+        Send all accumulated policy requests, one put_many() per inference queue.
+        We only batch requests generated while handling the same event (i.e. for several splits after
+        trajectory buffers become available), we never delay a request to wait for other splits since this would
+        defeat the purpose of double-buffered sampling.
+        """
+        if not self.pending_policy_requests:
+            return
+
+        with self.timing.add_time("enqueue_policy_requests"):
+            for policy_id, policy_requests in self.pending_policy_requests.items():
+                self.inference_queues[policy_id].put_many(policy_requests)
+            self.pending_policy_requests = dict()
+
     def _enqueue_complete_rollouts(self, complete_rollouts: List[Dict]):
         """Emit complete rollouts."""
+        if self.cfg.num_policies == 1:
+            # by far the most common case, all rollouts belong to the only policy so we don't need to group them
+            self.emit(new_trajectories_signal(0), complete_rollouts, self.sampling_device)
+            return
+
         rollouts_per_policy = dict()
         for rollout in complete_rollouts:
             policy_id = rollout["policy_id"]
@@ -228,13 +265,16 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
             self.emit(new_trajectories_signal(policy_id), rollouts, self.sampling_device)
 
     def advance_rollouts(self, split_idx: int, policy_id: PolicyID) -> None:
-        # TODO: update comment
         """
         Process incoming request from policy worker. Use the data (policy outputs, actions) to advance the simulation
         by one step on the corresponding VectorEnvRunner.
 
         If we successfully managed to advance the simulation, send requests to policy workers to get actions for the
         next step. If we completed the entire rollout, also send request to the learner!
+
+        With double-buffered sampling this is called separately for each split, in the order in which policy outputs
+        become available. While we simulate one split, the inference worker is already computing actions for the
+        other one, so we never wait for a particular split.
         """
         with inference_context(self.cfg.serial_mode):
             runner = self.env_runners[split_idx]
@@ -258,6 +298,7 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
             # If we also have the trajectory buffer to share the new data with the inference worker then
             # we are ready to enqueue inference request
             self._maybe_send_policy_request(runner)
+            self._flush_policy_requests()
 
     def on_trajectory_buffers_available(self, policy_id: PolicyID, training_iteration: int):
         """
@@ -292,6 +333,7 @@ class RolloutWorker(HeartbeatStoppableEventLoopObject, Configurable):
         # request a new trajectory (since they're now available), and finally send observations to the inference worker
         for split_idx in range(self.num_splits):
             self._maybe_send_policy_request(self.env_runners[split_idx])
+        self._flush_policy_requests()
 
     def on_update_training_info(self, training_info: Dict[PolicyID, Dict[str, Any]]) -> None:
         """Update training info, this will be propagated to environments using TrainingInfoInterface and RewardShapingInterface."""
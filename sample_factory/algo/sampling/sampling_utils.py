@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import torch
 
@@ -12,6 +12,16 @@ from sample_factory.utils.timing import Timing
 from sample_factory.utils.typing import PolicyID
 
 
+class PolicyRequest(NamedTuple):
+    """
+    Inference request for runners where all agents are controlled by the same policy.
+    Can be pre-built (i.e. once per rollout) instead of creating a {policy_id: request} dict on every step.
+    """
+
+    policy_id: PolicyID
+    request: Any
+
+
 class VectorEnvRunner(Configurable):
     def __init__(self, cfg: AttrDict, env_info: EnvInfo, worker_idx, split_idx, buffer_mgr, sampling_device: str):
         super().__init__(cfg)
@@ -37,7 +47,7 @@ class VectorEnvRunner(Configurable):
     def update_trajectory_buffers(self, timing) -> bool:
         raise NotImplementedError()
 
-    def generate_policy_request(self) -> Optional[Dict]:
+    def generate_policy_request(self) -> Optional[Dict | PolicyRequest]:
         raise NotImplementedError()
 
     def synchronize_devices(self) -> None:
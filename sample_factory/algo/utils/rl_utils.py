@@ -56,7 +56,7 @@ def calculate_discounted_sum_torch(
     Computing cumulative sum (of something) for the trajectory, taking episode termination into consideration.
     """
     if x_last is None:
-        x_last = x[-1].clone().fill_(0.0)
+        x_last = torch.zeros_like(x[-1])
 
     cumulative = x_last
 
@@ -22,6 +22,19 @@ from sample_factory.utils.gpu_utils import gpus_for_process
 from sample_factory.utils.typing import Device, MpQueue, PolicyID
 from sample_factory.utils.utils import log
 
+# number of float32 values in a typical 64-byte cache line
+CACHE_LINE_FLOATS = 16
+
+
+def cache_line_padded_num_samples(num_samples: int, sample_shape: List) -> int:
+    """
+    Round the number of samples up so that a block of num_samples float32 values of shape sample_shape spans
+    a whole number of cache lines.
+    """
+    floats_per_sample = math.prod(x for x in sample_shape if x)
+    samples_per_cache_line = CACHE_LINE_FLOATS // math.gcd(CACHE_LINE_FLOATS, floats_per_sample)
+    return math.ceil(num_samples / samples_per_cache_line) * samples_per_cache_line
+
 
 def policy_device(cfg: AttrDict, policy_id: PolicyID) -> torch.device:
     """Inference/Learning device for the given policy."""
@@ -135,9 +148,19 @@ def alloc_policy_output_tensors(cfg, env_info: EnvInfo, rnn_size, device, share)
     output_sizes = [shape[0] if shape else 1 for shape in output_shapes]
 
     if cfg.batched_sampling:
+        # Each [worker, split] slot is written by an inference worker and read by a rollout worker in different
+        # processes. On CPU we pad the slots to a multiple of the cache line size so that two neighbouring slots never
+        # share a cache line, otherwise writing policy outputs for one rollout worker would invalidate cache lines
+        # another rollout worker is currently reading (false sharing). We only expose views of unpadded slots.
+        num_samples = policy_outputs_shape[-1]
+        pad_slots = torch.device(device).type == "cpu"
+
         policy_output_tensors = TensorDict()
         for name, shape in policy_outputs:
-            policy_output_tensors[name] = init_tensor(policy_outputs_shape, torch.float32, shape, device, share)
+            padded_num_samples = cache_line_padded_num_samples(num_samples, shape) if pad_slots else num_samples
+            padded_shape = policy_outputs_shape[:-1] + [padded_num_samples]
+            t = init_tensor(padded_shape, torch.float32, shape, device, share)
+            policy_output_tensors[name] = t[:, :, :num_samples]
     else:
         # copying small policy outputs (e.g. individual value predictions & action logits) to shared memory is a
         # bottleneck on the policy worker. For optimization purposes we create additional tensors to hold
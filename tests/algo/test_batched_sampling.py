@@ -0,0 +1,84 @@
+import numpy as np
+import torch
+
+from sample_factory.algo.sampling.batched_sampling import BatchedVectorEnvRunner
+from sample_factory.algo.utils.misc import EPISODIC, POLICY_ID_KEY
+from sample_factory.utils.attr_dict import AttrDict
+
+
+class TestProcessEnvStep:
+    num_agents = 4
+
+    def _make_runner(self, frameskip: int, summaries_use_frameskip: bool) -> BatchedVectorEnvRunner:
+        cfg = AttrDict(
+            num_policies=1,
+            reward_scale=1.0,
+            reward_clip=1000.0,
+            summaries_use_frameskip=summaries_use_frameskip,
+        )
+        env_info = AttrDict(frameskip=frameskip, gpu_actions=False)
+        buffer_mgr = AttrDict(
+            traj_buffer_queues=dict(cpu=None),
+            traj_tensors_torch=dict(cpu=None),
+            policy_output_tensors_torch=dict(cpu=torch.zeros((1, 1, self.num_agents))),
+        )
+        runner = BatchedVectorEnvRunner(cfg, env_info, 1, 0, 0, buffer_mgr, "cpu", [None])
+
+        # same episode statistics as allocated in init(), without creating the envs
+        runner.curr_episode_reward = torch.zeros(self.num_agents)
+        runner.curr_episode_len = torch.zeros(self.num_agents, dtype=torch.int32)
+        runner.min_raw_rewards = torch.empty_like(runner.curr_episode_reward).fill_(np.inf)
+        runner.max_raw_rewards = torch.empty_like(runner.curr_episode_reward).fill_(-np.inf)
+        return runner
+
+    def _step(self, runner: BatchedVectorEnvRunner, rewards, dones):
+        rewards = torch.tensor(rewards, dtype=torch.float32)
+        dones = torch.tensor(dones, dtype=torch.bool)
+        runner._process_rewards(rewards, rewards)
+        infos = [dict() for _ in range(self.num_agents)]
+        return runner._process_env_step(rewards, dones, infos)
+
+    def test_episode_stats(self):
+        runner = self._make_runner(frameskip=4, summaries_use_frameskip=True)
+
+        assert self._step(runner, [1.0, -2.0, 3.0, 0.5], [False, False, False, False]) == []
+
+        # agents 0 and 2 finish their episodes
+        stats = self._step(runner, [2.0, 5.0, -1.0, 0.5], [True, False, True, False])[0][EPISODIC]
+        assert np.allclose(stats["reward"], [3.0, 2.0])
+        assert np.array_equal(stats["len"], [8, 8])
+        assert np.allclose(stats["min_raw_reward"], [1.0, -1.0])
+        assert np.allclose(stats["max_raw_reward"], [2.0, 3.0])
+
+        # agent 1 finishes its episode
+        reports = self._step(runner, [-3.0, 1.0, 4.0, 0.5], [False, True, False, False])
+        assert len(reports) == 1
+        assert reports[0][POLICY_ID_KEY] == runner.policy_id
+        stats = reports[0][EPISODIC]
+        assert np.allclose(stats["reward"], [4.0])
+        assert np.array_equal(stats["len"], [12])
+        assert np.allclose(stats["min_raw_reward"], [-2.0])
+        assert np.allclose(stats["max_raw_reward"], [5.0])
+
+        # agent 1 is reset, other agents keep accumulating
+        assert np.allclose(runner.curr_episode_reward.numpy(), [-3.0, 0.0, 4.0, 1.5])
+        assert np.array_equal(runner.curr_episode_len.numpy(), [4, 0, 4, 12])
+        assert np.allclose(runner.min_raw_rewards.numpy(), [-3.0, np.inf, 4.0, 0.5])
+        assert np.allclose(runner.max_raw_rewards.numpy(), [-3.0, -np.inf, 4.0, 0.5])
+
+    def test_multiple_finished_agents(self):
+        runner = self._make_runner(frameskip=4, summaries_use_frameskip=False)
+
+        self._step(runner, [1.0, 2.0, 3.0, 4.0], [False, False, False, False])
+        reports = self._step(runner, [-1.0, 0.0, 1.0, 2.0], [True, False, True, True])
+
+        stats = reports[0][EPISODIC]
+        assert np.allclose(stats["reward"], [0.0, 4.0, 6.0])
+        assert np.array_equal(stats["len"], [2, 2, 2])
+        assert np.allclose(stats["min_raw_reward"], [-1.0, 1.0, 2.0])
+        assert np.allclose(stats["max_raw_reward"], [1.0, 3.0, 4.0])
+
+        assert np.allclose(runner.curr_episode_reward.numpy(), [0.0, 2.0, 0.0, 0.0])
+        assert np.array_equal(runner.curr_episode_len.numpy(), [0, 2, 0, 0])
+        assert np.allclose(runner.min_raw_rewards.numpy(), [np.inf, 0.0, np.inf, np.inf])
+        assert np.allclose(runner.max_raw_rewards.numpy(), [-np.inf, 2.0, -np.inf, -np.inf])
@@ -0,0 +1,40 @@
+import gymnasium as gym
+import pytest
+
+from sample_factory.algo.utils.env_info import EnvInfo
+from sample_factory.algo.utils.shared_buffers import alloc_policy_output_tensors
+from sample_factory.utils.attr_dict import AttrDict
+
+
+class TestPolicyOutputTensors:
+    @pytest.mark.parametrize("num_envs_per_worker", [2, 6])
+    @pytest.mark.parametrize("num_agents", [1, 5])
+    @pytest.mark.parametrize("rnn_size", [7, 512])
+    @pytest.mark.parametrize("action_space", [gym.spaces.Discrete(3), gym.spaces.Box(-1, 1, shape=(3,))])
+    def test_batched_slots_cache_line_aligned(self, num_envs_per_worker, num_agents, rnn_size, action_space):
+        cfg = AttrDict(
+            num_workers=3, worker_num_splits=2, num_envs_per_worker=num_envs_per_worker, batched_sampling=True
+        )
+
+        env_info = EnvInfo(
+            obs_space=gym.spaces.Dict(obs=gym.spaces.Box(-1, 1, shape=(4,))),
+            action_space=action_space,
+            num_agents=num_agents,
+            gpu_actions=False,
+            gpu_observations=False,
+            action_splits=[],
+            all_discrete=isinstance(action_space, gym.spaces.Discrete),
+            frameskip=1,
+        )
+
+        policy_output_tensors, output_names, _ = alloc_policy_output_tensors(cfg, env_info, rnn_size, "cpu", False)
+        num_samples = (num_envs_per_worker // cfg.worker_num_splits) * num_agents
+
+        for name in output_names:
+            t = policy_output_tensors[name]
+            assert t.shape[:3] == (cfg.num_workers, cfg.worker_num_splits, num_samples)
+            for w in range(cfg.num_workers):
+                for s in range(cfg.worker_num_splits):
+                    slot = t[w, s]
+                    assert slot.is_contiguous(), f"{name}[{w}, {s}] is not contiguous"
+                    assert slot.data_ptr() % 64 == 0, f"{name}[{w}, {s}] does not start at a cache line boundary"